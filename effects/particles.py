@@ -6,12 +6,14 @@ import cv2
 class Particle:
     def __init__(self, pos, vel, life, color):
         self.pos = np.array(pos, dtype=np.float32)
+        self.prev_pos = self.pos.copy()
         self.vel = np.array(vel, dtype=np.float32)
         self.life = life
         self.max_life = life
         self.color = color
 
     def update(self, dt):
+        self.prev_pos[:] = self.pos
         self.pos += self.vel * dt
         self.life -= dt
         # slight gravity/downward drift
@@ -44,10 +46,11 @@ class ParticleEngine:
             p.update(dt)
         self.particles = [p for p in self.particles if p.alive()]
 
-    def render(self, img):
+    def render(self, img, blend=1.0):
+        # blend interpolates between the last two simulation steps
         for p in self.particles:
             alpha = max(0.0, min(1.0, p.life / p.max_life))
-            x, y = int(p.pos[0]), int(p.pos[1])
+            x, y = _lerp_pos(p, blend)
             if x < 0 or x >= img.shape[1] or y < 0 or y >= img.shape[0]:
                 continue
             cv2.circle(img, (x, y), int(2 + 3 * (1 - alpha)), p.color, -1, lineType=cv2.LINE_AA)
@@ -56,6 +59,7 @@ class ParticleEngine:
 class SporeParticle:
     def __init__(self, pos, vel, life, color=(120, 30, 30), size=2):
         self.pos = np.array(pos, dtype=np.float32)
+        self.prev_pos = self.pos.copy()
         self.vel = np.array(vel, dtype=np.float32)
         self.life = life
         self.max_life = life
@@ -64,6 +68,7 @@ class SporeParticle:
 
     def update(self, dt):
         # slower floating movement
+        self.prev_pos[:] = self.pos
         self.pos += self.vel * dt
         self.life -= dt
         # gentle drift
@@ -95,11 +100,17 @@ class SporeEngine:
             s.update(dt)
         self.spores = [s for s in self.spores if s.alive()]
 
-    def render(self, img):
+    def render(self, img, blend=1.0):
         for s in self.spores:
             a = max(0.0, min(1.0, s.life / s.max_life))
-            x, y = int(s.pos[0]), int(s.pos[1])
+            x, y = _lerp_pos(s, blend)
             if x < 0 or x >= img.shape[1] or y < 0 or y >= img.shape[0]:
                 continue
             col = tuple(int(c * a) for c in s.color)
             cv2.circle(img, (x, y), s.size, col, -1, lineType=cv2.LINE_AA)
+
+
+def _lerp_pos(p, blend):
+    x = p.prev_pos[0] + (p.pos[0] - p.prev_pos[0]) * blend
+    y = p.prev_pos[1] + (p.pos[1] - p.prev_pos[1]) * blend
+    return int(x), int(y)
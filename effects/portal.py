@@ -4,30 +4,67 @@ import math
 import time
 from .particles import ParticleEngine
 from .particles import SporeEngine
-from .lightning import draw_lightning
-from .shaders import displacement_map, heat_distort, glow_effect
+from .lightning import draw_lightning, draw_rim_cracks
+from .shaders import displacement_map, displacement_maps, heat_distort, glow_layer
 from utils.helpers import make_circle_mask, draw_glow, lerp
 from .shaders import chromatic_aberration, crt_filter, color_grade_upside_down
+from .tiles import run_strips
+from utils.clock import SimClock
+from utils.memprofile import stage
+
+# addWeighted rounds, so below half an 8-bit level even a 255 pixel adds nothing
+MIN_WEIGHT = 0.5 / 255
+# a closing portal this far shut is culled instead of rendered
+MIN_OPEN = 0.02
 
 
 class Portal:
-    def __init__(self, size=(1280, 720)):
+    def __init__(self, size=(1280, 720), executor=None, particles=None, spores=None, sim_hz=30.0, clock=None):
         self.width, self.height = size[0], size[1]
         self.center = (self.width // 2, self.height // 2)
         self.radius = min(self.width, self.height) // 6
         self.open_amount = 0.0
         self.state = 'closed'  # closed, opening, open, closing
-        self.particles = ParticleEngine(max_particles=800)
-        self.spores = SporeEngine((self.height, self.width), max_spores=400)
+        # a PortalScene hands in shared pools and updates them itself; the pools
+        # are stepped together, so they are either both shared or both owned
+        if (particles is None) != (spores is None):
+            raise ValueError('pass both particles and spores, or neither')
+        self.owns_pools = particles is None
+        self.particles = particles if particles is not None else ParticleEngine(max_particles=800)
+        self.spores = spores if spores is not None else SporeEngine((self.height, self.width), max_spores=400)
         self.last_t = time.time()
         self.rotation = 0.0
         self.twist = 0.0
         self.last_open_t = 0
         self.core_color = (30, 10, 180)  # will tint later
+        # optional StripExecutor for the full-frame per-pixel stages
+        self.executor = executor
+        # simulation runs on a fixed timestep; render reads values interpolated between steps
+        self.clock = clock if clock is not None else SimClock(hz=sim_hz)
+        self.prev_open_amount = 0.0
+        self.prev_twist = 0.0
+        self.render_open = 0.0
+        self.render_twist = 0.0
+        # optional utils.memprofile.MemoryProfiler, records per-stage allocations
+        self.profiler = None
+        # geometry-only layers kept while the portal is fully open and still
+        self._static = {}
 
     def update(self, dt):
-        # update particles and animation states
-        self.particles.update(dt)
+        # a scene portal shares the scene's clock and pools; stepping it here
+        # would advance them for every other portal too
+        if not self.owns_pools:
+            raise RuntimeError('portal belongs to a PortalScene, call PortalScene.update instead')
+        for _ in range(self.clock.advance(dt)):
+            self.particles.update(self.clock.step)
+            self.spores.update(self.clock.step)
+            self.step(self.clock.step)
+        self.sync()
+
+    def step(self, dt):
+        # one fixed simulation step of the open/close animation and twist
+        self.prev_open_amount = self.open_amount
+        self.prev_twist = self.twist
         if self.state == 'opening':
             self.open_amount = min(1.0, self.open_amount + dt * 1.2)
             if self.open_amount >= 1.0:
@@ -36,8 +73,13 @@ class Portal:
             self.open_amount = max(0.0, self.open_amount - dt * 1.8)
             if self.open_amount <= 0.0:
                 self.state = 'closed'
-        # slow twist decay
-        self.twist *= 0.92
+        # slow twist decay, 0.92 per 1/30s
+        self.twist *= 0.92 ** (dt * 30.0)
+
+    def sync(self):
+        a = self.clock.alpha
+        self.render_open = lerp(self.prev_open_amount, self.open_amount, a)
+        self.render_twist = lerp(self.prev_twist, self.twist, a)
 
     def open(self):
         self.state = 'opening'
@@ -59,91 +101,226 @@ class Portal:
             self.spores.emit_spore((self.center[0] + np.random.randint(-self.radius, self.radius), self.center[1] + np.random.randint(-self.radius, self.radius)))
 
     def set_pos(self, pos):
-        self.center = (int(pos[0]), int(pos[1]))
+        center = (int(pos[0]), int(pos[1]))
+        if center != self.center:
+            # moved: cached static layers belong to the old position
+            self._static.clear()
+        self.center = center
 
     def apply_twist(self, amount):
         self.twist += amount
 
-    def render(self, frame, upside_down=True):
-        h, w = frame.shape[:2]
-        now = int(time.time() * 1000)
-        # If Upside Down visuals are disabled, return original camera frame (normal webcam)
-        if not upside_down:
-            return frame
+    def core_radius(self):
+        return int(self.radius * (0.55 + self.render_open * 1.6))
+
+    def bounds(self, w, h):
+        # region touched by this portal: cracks reach ~2.35 radii, glow blur adds 25px
+        reach = int(2.5 * self.core_radius()) + 32
+        cx, cy = self.center
+        x0, y0 = max(0, cx - reach), max(0, cy - reach)
+        x1, y1 = min(w, cx + reach), min(h, cy + reach)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return x0, y0, x1, y1
+
+    def visible(self, w, h):
+        # a fully closed (or all but closed) portal contributes nothing; off-screen ones are culled too
+        if self.state == 'closed' and self.render_open <= 0.0:
+            return False
+        if self.state == 'closing' and self.render_open < MIN_OPEN:
+            return False
+        return self.bounds(w, h) is not None
 
-        # create portal mask
-        radius = int(self.radius * (0.55 + self.open_amount * 1.6))
-        mask = make_circle_mask(frame.shape, self.center, radius)
-        # start with desaturated/darker background for Upside Down mood
-        bg = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        bg = cv2.cvtColor(bg, cv2.COLOR_GRAY2BGR)
-        bg = cv2.convertScaleAbs(bg, alpha=0.75, beta=-20)
-        # tint background slightly
-        bg = color_grade_upside_down(bg)
-        portal_img = np.zeros_like(frame)
-        # radial gradient core
-        Y, X = np.indices((h, w))
-        dx = X - self.center[0]
-        dy = Y - self.center[1]
-        dist = np.sqrt(dx * dx + dy * dy)
-        with_core = dist < radius
-        t = (radius - dist) / (radius + 1e-6)
-        t = np.clip(t, 0, 1)
-        # create red Vecna-like core with noise
-        noise = (np.random.rand(h, w) * 0.6 + 0.4) * t
-        core = np.zeros_like(frame, dtype=np.float32)
-        # red/purple center
-        core[..., 2] = (np.clip(200 + 90 * noise, 0, 255)) * (t ** 2.0)
-        core[..., 1] = (np.clip(18 + 12 * noise, 0, 255)) * (t ** 1.3)
-        core[..., 0] = (np.clip(6 + 4 * noise, 0, 255)) * (t ** 1.0)
-        portal_img = np.clip(core, 0, 255).astype(np.uint8)
-        # inner moving ripples
-        ripple = np.zeros_like(frame)
-        ripple_radius = radius * (0.3 + 0.7 * self.open_amount)
-        freq = 12.0
-        theta = np.arctan2(dy, dx) + self.twist * 0.5
-        ripple_field = np.sin(dist / max(1.0, ripple_radius / freq) + theta * 4.0 + now / 400.0)
-        ripple_mask = (dist < ripple_radius * 1.1) & (dist > ripple_radius * 0.2)
-        # ensure shapes align for broadcasting: make both (h,w,1)
-        rf = (ripple_field * 0.5 + 0.5)[..., None]
-        tt = (t ** 1.4)[..., None]
-        ripple_strength = rf * tt
-        ripple[..., 2] = (ripple_strength[..., 0] * 160).astype(np.uint8)
-        portal_img = cv2.addWeighted(portal_img, 1.0, ripple.astype(np.uint8), 0.55 + 0.25 * self.open_amount, 0)
+    def _layer(self, name, key, build):
+        # reuse a static layer only while fully open; keys include the center because
+        # bounds() clamps to the frame and the same box fits many positions
+        if self.state != 'open' or self.render_open < 1.0:
+            self._static.clear()
+            return build()
+        entry = self._static.get(name)
+        if entry is None or entry[0] != key:
+            entry = (key, build())
+            self._static[name] = entry
+        return entry[1]
+
+    def render_core(self, distorted, portal_img, mask, now):
+        # draw core, ripples and displacement into the shared buffers, only inside bounds
+        h, w = distorted.shape[:2]
+        box = self.bounds(w, h)
+        x0, y0, x1, y1 = box
+        local = (self.center[0] - x0, self.center[1] - y0)
+        radius = self.core_radius()
+        cv2.circle(mask, (int(self.center[0]), int(self.center[1])), radius, 255, -1)
+        # radial gradient core with inner moving ripples
+        geo = self._layer('geometry', (self.center, box, radius), lambda: self._geometry(y1 - y0, x1 - x0, local, radius))
+        core = np.empty((y1 - y0, x1 - x0, 3), dtype=np.uint8)
+        ripple_radius = radius * (0.3 + 0.7 * self.render_open)
+        ripple_weight = 0.55 + 0.25 * self.render_open
+        seed = np.random.randint(1 << 31)
+        run_strips(self.executor, 'core', _core_rows, y1 - y0, core, geo, ripple_radius, ripple_weight, self.render_twist, now, seed)
+        roi = portal_img[y0:y1, x0:x1]
+        np.maximum(roi, core, out=roi)
         # displacement/distortion
         # heavier displacement when open
-        distorted = displacement_map(frame.copy(), self.center, int(radius * (1.0 + 0.9 * self.open_amount)), strength=26 * (0.3 + self.open_amount))
-        # composite portal onto distorted background using graded bg
-        mask_f = (mask.astype(np.float32) / 255.0)[..., None]
-        comp = (distorted.astype(np.float32) * (1 - mask_f) + (portal_img.astype(np.float32) * mask_f)).astype(np.uint8)
-        # blend with the moody background outside portal
-        bg_mask = (1 - mask_f)
-        comp = (comp.astype(np.float32) * (1 - mask_f) + bg.astype(np.float32) * bg_mask).astype(np.uint8)
+        disp_radius = int(radius * (1.0 + 0.9 * self.render_open))
+        strength = 26 * (0.3 + self.render_open)
+        maps = self._layer('displace', (self.center, box, disp_radius, strength),
+                           lambda: displacement_maps(y1 - y0, x1 - x0, local, disp_radius, strength, executor=self.executor))
+        distorted[y0:y1, x0:x1] = displacement_map(distorted[y0:y1, x0:x1], local, disp_radius, strength, executor=self.executor, maps=maps)
+
+    def _geometry(self, h, w, center, radius):
+        geo = np.empty((3, h, w), dtype=np.float32)
+        run_strips(self.executor, 'geometry', _geometry_rows, h, geo, center, radius)
+        return geo
+
+    def render_rim(self, comp, now):
+        h, w = comp.shape[:2]
+        x0, y0, x1, y1 = self.bounds(w, h)
+        local = (self.center[0] - x0, self.center[1] - y0)
+        radius = self.core_radius()
         # heat distort on portal area
-        comp = heat_distort(comp, self.center, radius, now, strength=12 * (0.3 + self.open_amount))
+        heat = 12 * (0.3 + self.render_open)
+        roi = heat_distort(comp[y0:y1, x0:x1], local, radius, now, strength=heat, executor=self.executor)
         # add lightning around rim and rim cracks
-        lightning_layer = np.zeros_like(frame)
-        if self.open_amount > 0.03:
-            draw_lightning(lightning_layer, self.center, int(radius * (1.0 + 0.12 * np.random.rand())), intensity=1.0 + self.open_amount, color=(40, 20, 240))
-        comp = cv2.addWeighted(comp, 1.0, lightning_layer, 0.9 * (0.6 + self.open_amount * 0.7), 0)
+        if self.render_open > 0.03:
+            lightning_layer = np.zeros_like(roi)
+            draw_lightning(lightning_layer, local, int(radius * (1.0 + 0.12 * np.random.rand())), intensity=1.0 + self.render_open, color=(40, 20, 240))
+            roi = cv2.addWeighted(roi, 1.0, lightning_layer, 0.9 * (0.6 + self.render_open * 0.7), 0)
         # rim cracks overlay
-        from .lightning import draw_rim_cracks
-        cracks = draw_rim_cracks(frame, self.center, radius, intensity=1.0 * self.open_amount)
-        cracks_col = cv2.cvtColor(cracks, cv2.COLOR_GRAY2BGR)
-        comp = cv2.addWeighted(comp, 1.0, cracks_col, 0.5 * self.open_amount, 0)
-        # particle render
-        self.particles.render(comp)
-        # ambient spores render
-        self.spores.update(1.0 / 30.0)
-        self.spores.render(comp)
-        # glow
-        glow_mask = (mask * (0.5 + 0.5 * self.open_amount)).astype(np.uint8)
-        comp = glow_effect(comp, glow_mask, ksize=51, intensity=1.0 * (0.8 + self.open_amount), color=(40, 16, 220))
-        # chromatic aberration and CRT tint for Upside Down feel
-        comp = chromatic_aberration(comp, amount=6 * (0.4 + self.open_amount))
+        crack_weight = 0.5 * self.render_open
+        if crack_weight >= MIN_WEIGHT:
+            cracks = draw_rim_cracks(roi, local, radius, intensity=1.0 * self.render_open)
+            cracks_col = cv2.cvtColor(cracks, cv2.COLOR_GRAY2BGR)
+            roi = cv2.addWeighted(roi, 1.0, cracks_col, crack_weight, 0)
+        comp[y0:y1, x0:x1] = roi
+
+    def render_glow(self, comp):
+        h, w = comp.shape[:2]
+        box = self.bounds(w, h)
+        x0, y0, x1, y1 = box
+        local = (self.center[0] - x0, self.center[1] - y0)
+        radius = self.core_radius()
+        roi = comp[y0:y1, x0:x1]
+
+        def build():
+            mask = make_circle_mask(roi.shape, local, radius)
+            glow_mask = (mask * (0.5 + 0.5 * self.render_open)).astype(np.uint8)
+            return glow_layer(glow_mask, ksize=51, color=(40, 16, 220))
+
+        colored = self._layer('glow', (self.center, box, radius), build)
+        comp[y0:y1, x0:x1] = cv2.addWeighted(roi, 1.0, colored, 1.0 * (0.8 + self.render_open), 0)
+
+    def render(self, frame, upside_down=True):
+        # If Upside Down visuals are disabled, return original camera frame (normal webcam)
+        if not upside_down:
+            return frame
+        h, w = frame.shape[:2]
+        portals = [self] if self.visible(w, h) else []
+        return render_portals(frame, portals, self.particles, self.spores, blend=self.clock.alpha,
+                              executor=self.executor, profiler=self.profiler)
+
+
+def grade_background(frame):
+    # start with desaturated/darker background for Upside Down mood
+    bg = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    bg = cv2.cvtColor(bg, cv2.COLOR_GRAY2BGR)
+    bg = cv2.convertScaleAbs(bg, alpha=0.75, beta=-20)
+    # tint background slightly
+    return color_grade_upside_down(bg)
+
+
+def post_process(comp, amount, now, executor=None, profiler=None):
+    # chromatic aberration and CRT tint for Upside Down feel
+    with stage(profiler, 'aberration'):
+        comp = chromatic_aberration(comp, amount=6 * (0.4 + amount))
+    with stage(profiler, 'grade'):
         comp = color_grade_upside_down(comp)
-        comp = crt_filter(comp, scan_alpha=0.06)
-        # vignette / CRT flicker
+    with stage(profiler, 'crt'):
+        comp = crt_filter(comp, scan_alpha=0.06, executor=executor)
+    # vignette / CRT flicker
+    with stage(profiler, 'flicker'):
         flicker = (np.random.rand() * 0.06 + 0.97) * (0.95 + 0.05 * np.sin(now / 90.0))
-        comp = np.clip(comp.astype(np.float32) * flicker, 0, 255).astype(np.uint8)
-        return comp
+        out = np.empty_like(comp)
+        run_strips(executor, 'flicker', _scale_rows, comp.shape[0], comp, out, flicker)
+    return out
+
+
+def render_portals(frame, portals, particles, spores, blend=1.0, executor=None, profiler=None):
+    # full-frame passes (background grade, composite, post) run once no matter
+    # how many portals there are; each portal only works inside its own bounds
+    h, w = frame.shape[:2]
+    now = int(time.time() * 1000)
+    if portals:
+        with stage(profiler, 'core'):
+            distorted = frame.copy()
+            portal_img = np.zeros_like(frame)
+            mask = np.zeros((h, w), dtype=np.uint8)
+            for p in portals:
+                p.render_core(distorted, portal_img, mask, now)
+        # grade the distorted frame, so outside the portals every tier shows the same graded background
+        with stage(profiler, 'background'):
+            comp = grade_background(distorted)
+        # portal cores replace the background inside their masks
+        with stage(profiler, 'composite'):
+            run_strips(executor, 'composite', _composite_rows, h, comp, portal_img, mask)
+        with stage(profiler, 'rim'):
+            for p in portals:
+                p.render_rim(comp, now)
+    else:
+        # closed tier: nothing to distort or composite, the graded background is the frame
+        with stage(profiler, 'background'):
+            comp = grade_background(frame)
+    with stage(profiler, 'particles'):
+        # particle render
+        particles.render(comp, blend)
+        # ambient spores render
+        spores.render(comp, blend)
+    # glow
+    with stage(profiler, 'glow'):
+        for p in portals:
+            p.render_glow(comp)
+    amount = max([p.render_open for p in portals], default=0.0)
+    return post_process(comp, amount, now, executor, profiler)
+
+
+def _geometry_rows(y0, y1, geo, center, radius):
+    w = geo.shape[2]
+    X = np.arange(w, dtype=np.float32)[None, :]
+    Y = np.arange(y0, y1, dtype=np.float32)[:, None]
+    dx = X - center[0]
+    dy = Y - center[1]
+    dist = np.sqrt(dx * dx + dy * dy)
+    geo[0, y0:y1] = dist
+    geo[1, y0:y1] = np.clip((radius - dist) / (radius + 1e-6), 0, 1)
+    geo[2, y0:y1] = np.arctan2(dy, dx)
+
+
+def _core_rows(y0, y1, out, geo, ripple_radius, ripple_weight, twist, now, seed):
+    w = out.shape[1]
+    dist = geo[0, y0:y1]
+    t = geo[1, y0:y1]
+    # create red Vecna-like core with noise; a generator per strip, since the
+    # global RandomState holds a lock and would serialize the strips
+    rng = np.random.default_rng((seed, y0))
+    noise = (rng.random((y1 - y0, w), dtype=np.float32) * 0.6 + 0.4) * t
+    core = out[y0:y1]
+    # red/purple center
+    core[..., 1] = np.clip(np.clip(18 + 12 * noise, 0, 255) * (t ** 1.3), 0, 255)
+    core[..., 0] = np.clip(np.clip(6 + 4 * noise, 0, 255) * t, 0, 255)
+    red = np.clip(np.clip(200 + 90 * noise, 0, 255) * (t ** 2.0), 0, 255).astype(np.uint8)
+    # inner moving ripples, added onto the red channel only
+    freq = 12.0
+    phase = (now / 400.0) % (2 * np.pi)
+    theta = geo[2, y0:y1] + twist * 0.5
+    ripple_field = np.sin(dist / max(1.0, ripple_radius / freq) + theta * 4.0 + phase)
+    ripple = ((ripple_field * 0.5 + 0.5) * (t ** 1.4) * 160).astype(np.uint8)
+    core[..., 2] = np.clip(np.rint(red + ripple * np.float32(ripple_weight)), 0, 255)
+
+
+def _composite_rows(y0, y1, comp, portal_img, mask):
+    # the mask is a hard-edged circle, so compositing is a masked copy
+    np.copyto(comp[y0:y1], portal_img[y0:y1], where=mask[y0:y1, :, None] > 0)
+
+
+def _scale_rows(y0, y1, img, out, gain):
+    out[y0:y1] = np.clip(img[y0:y1].astype(np.float32) * gain, 0, 255).astype(np.uint8)
@@ -0,0 +1,54 @@
+from .particles import ParticleEngine
+from .particles import SporeEngine
+from .portal import Portal, render_portals
+from utils.clock import SimClock
+
+
+class PortalScene:
+    # several portals sharing one particle/spore pool and one set of full-frame passes
+    def __init__(self, size=(1280, 720), executor=None, max_portals=4, sim_hz=30.0):
+        self.width, self.height = size[0], size[1]
+        self.executor = executor
+        # one fixed-timestep clock drives the pools and every portal
+        self.clock = SimClock(hz=sim_hz)
+        self.max_portals = max_portals
+        self.particles = ParticleEngine(max_particles=800 * 2)
+        self.spores = SporeEngine((self.height, self.width), max_spores=400 * 2)
+        self.portals = []
+        self.profiler = None
+
+    def add(self, center=None):
+        if len(self.portals) >= self.max_portals:
+            return None
+        portal = Portal(size=(self.width, self.height), executor=self.executor,
+                        particles=self.particles, spores=self.spores, clock=self.clock)
+        if center is not None:
+            portal.set_pos(center)
+        self.portals.append(portal)
+        return portal
+
+    def remove(self, portal):
+        if portal in self.portals:
+            self.portals.remove(portal)
+
+    def update(self, dt):
+        # shared pools advance once per step, each portal only animates itself
+        for _ in range(self.clock.advance(dt)):
+            self.particles.update(self.clock.step)
+            self.spores.update(self.clock.step)
+            for p in self.portals:
+                p.step(self.clock.step)
+        for p in self.portals:
+            p.sync()
+
+    def visible_portals(self, w, h):
+        # cull closed portals and portals whose region falls outside the frame
+        return [p for p in self.portals if p.visible(w, h)]
+
+    def render(self, frame, upside_down=True):
+        if not upside_down:
+            return frame
+        h, w = frame.shape[:2]
+        portals = self.visible_portals(w, h)
+        return render_portals(frame, portals, self.particles, self.spores, blend=self.clock.alpha,
+                              executor=self.executor, profiler=self.profiler)
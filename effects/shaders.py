@@ -1,64 +1,111 @@
 import numpy as np
 import cv2
 import math
+from .tiles import run_strips
 
 
-def displacement_map(img, center, radius, strength=15.0, seed=0):
-    # create a simple radial displacement using sin+noise
-    h, w = img.shape[:2]
-    Y, X = np.indices((h, w), dtype=np.float32)
+_noise_cache = {}
+
+
+def _noise_field(h, w, seed):
+    # seeded noise never changes, so build it once per seed and crop;
+    # regions of varying size reuse the same field instead of filling the cache
+    noise = _noise_cache.get(seed)
+    if noise is None or noise.shape[0] < h or noise.shape[1] < w:
+        nh, nw = (h, w) if noise is None else (max(h, noise.shape[0]), max(w, noise.shape[1]))
+        rng = np.random.RandomState(seed)
+        noise = rng.randn(nh, nw).astype(np.float32)
+        _noise_cache[seed] = noise
+    return noise[:h, :w]
+
+
+def _displace_rows(y0, y1, map_x, map_y, center, radius, strength, noise):
+    w = map_x.shape[1]
+    X = np.arange(w, dtype=np.float32)[None, :]
+    Y = np.arange(y0, y1, dtype=np.float32)[:, None]
     cx, cy = center
     dx = X - cx
     dy = Y - cy
     dist = np.sqrt(dx * dx + dy * dy)
-    mask = dist <= radius
     # normalized radius
     nr = (radius - dist) / (radius + 1e-6)
     nr = np.clip(nr, 0, 1)
-    # noise
-    rng = np.random.RandomState(seed)
-    noise = rng.randn(h, w).astype(np.float32)
     # displacement factor
-    disp = np.sin(dist / 8.0 + noise * 3.0) * (nr ** 1.2) * strength
+    disp = np.sin(dist / 8.0 + noise[y0:y1] * 3.0) * (nr ** 1.2) * strength
     # compute offsets
-    ox = (dx / (dist + 1e-6)) * disp
-    oy = (dy / (dist + 1e-6)) * disp
-    map_x = (X + ox).astype(np.float32)
-    map_y = (Y + oy).astype(np.float32)
-    out = cv2.remap(img, map_x, map_y, interpolation=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
-    return out
+    inv = disp / (dist + 1e-6)
+    map_x[y0:y1] = X + dx * inv
+    map_y[y0:y1] = Y + dy * inv
 
 
-def heat_distort(img, center, radius, time_ms, strength=8.0):
-    # small FFT-like jitter using sin waves
+def _remap_rows(y0, y1, img, out, map_x, map_y):
+    out[y0:y1] = cv2.remap(img, map_x[y0:y1], map_y[y0:y1], interpolation=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
+
+
+def displacement_maps(h, w, center, radius, strength=15.0, seed=0, executor=None):
+    # remap tables for displacement_map; they only depend on geometry, so callers may keep them
+    noise = _noise_field(h, w, seed)
+    map_x = np.empty((h, w), dtype=np.float32)
+    map_y = np.empty((h, w), dtype=np.float32)
+    run_strips(executor, 'displace', _displace_rows, h, map_x, map_y, center, radius, strength, noise)
+    return map_x, map_y
+
+
+def displacement_map(img, center, radius, strength=15.0, seed=0, executor=None, maps=None):
+    # create a simple radial displacement using sin+noise
     h, w = img.shape[:2]
-    Y, X = np.indices((h, w), dtype=np.float32)
+    if maps is None:
+        maps = displacement_maps(h, w, center, radius, strength, seed, executor)
+    out = np.empty_like(img)
+    run_strips(executor, 'remap', _remap_rows, h, img, out, maps[0], maps[1])
+    return out
+
+
+def _heat_rows(y0, y1, img, out, center, radius, t, strength):
+    w = img.shape[1]
+    X = np.arange(w, dtype=np.float32)[None, :]
+    Y = np.arange(y0, y1, dtype=np.float32)[:, None]
     cx, cy = center
     dx = X - cx
     dy = Y - cy
     dist = np.sqrt(dx * dx + dy * dy)
-    mask = dist <= radius
     nr = (radius - dist) / (radius + 1e-6)
-    nr = np.clip(nr, 0, 1)
-    t = time_ms / 1000.0
-    ox = np.sin((Y + t * 120.0) / 10.0) * (nr ** 1.5) * (strength * 0.6)
-    oy = np.cos((X + t * 90.0) / 12.0) * (nr ** 1.5) * (strength * 0.6)
+    nr = np.clip(nr, 0, 1) ** 1.5
+    # wrap the time phase in float64 first, float32 rows cannot hold epoch seconds
+    phase_y = (t * 12.0) % (2 * np.pi)
+    phase_x = (t * 7.5) % (2 * np.pi)
+    ox = np.sin(Y / 10.0 + phase_y) * nr * (strength * 0.6)
+    oy = np.cos(X / 12.0 + phase_x) * nr * (strength * 0.6)
     map_x = (X + ox).astype(np.float32)
     map_y = (Y + oy).astype(np.float32)
-    out = cv2.remap(img, map_x, map_y, interpolation=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
+    out[y0:y1] = cv2.remap(img, map_x, map_y, interpolation=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
+
+
+def heat_distort(img, center, radius, time_ms, strength=8.0, executor=None):
+    # small FFT-like jitter using sin waves
+    h, w = img.shape[:2]
+    t = time_ms / 1000.0
+    out = np.empty_like(img)
+    run_strips(executor, 'heat', _heat_rows, h, img, out, center, radius, t, strength)
     return out
 
 
-def glow_effect(img, mask, ksize=31, intensity=1.0, color=(0, 0, 255)):
-    if mask is None:
-        return img
+def glow_layer(mask, ksize=31, color=(0, 0, 255)):
+    # colored, normalized blur of the mask; independent of the image it is added to
     blur = cv2.GaussianBlur(mask, (ksize, ksize), 0)
     blur = cv2.normalize(blur, None, 0, 255, cv2.NORM_MINMAX)
-    colored = np.zeros_like(img, dtype=np.uint8)
+    colored = np.zeros(mask.shape[:2] + (3,), dtype=np.uint8)
     b, g, r = color
     colored[:, :, 0] = (blur * (b / 255.0)).astype(np.uint8)
     colored[:, :, 1] = (blur * (g / 255.0)).astype(np.uint8)
     colored[:, :, 2] = (blur * (r / 255.0)).astype(np.uint8)
+    return colored
+
+
+def glow_effect(img, mask, ksize=31, intensity=1.0, color=(0, 0, 255)):
+    if mask is None:
+        return img
+    colored = glow_layer(mask, ksize, color)
     out = cv2.addWeighted(img, 1.0, colored, intensity, 0)
     return out
 
@@ -75,22 +122,26 @@ def chromatic_aberration(img, amount=6):
     return out
 
 
-def crt_filter(img, scan_alpha=0.05, curvature=0.0008):
-    # simple scanlines + slight vignette / curvature
-    h, w = img.shape[:2]
-    out = img.copy().astype(np.float32)
+def _crt_rows(y0, y1, img, out, scan_alpha, vx2, vy2):
     # scanlines
-    y = np.arange(h).reshape(h, 1)
+    y = np.arange(y0, y1, dtype=np.float32)
     scan = (0.5 + 0.5 * np.sin(y / 2.5))
     scan = (1.0 - scan * scan_alpha)[:, None]
-    out = out * scan
     # slight vignette
-    X, Y = np.meshgrid(np.linspace(-1, 1, w), np.linspace(-1, 1, h))
-    radius = np.sqrt(X * X + Y * Y)
-    vign = 1.0 - (radius ** 2) * 0.6
+    vign = 1.0 - (vy2[y0:y1, None] + vx2[None, :]) * 0.6
     vign = np.clip(vign, 0.45, 1.0)
-    out = out * vign[:, :, None]
-    return np.clip(out, 0, 255).astype(np.uint8)
+    shade = (scan * vign)[:, :, None]
+    out[y0:y1] = np.clip(img[y0:y1] * shade, 0, 255).astype(np.uint8)
+
+
+def crt_filter(img, scan_alpha=0.05, curvature=0.0008, executor=None):
+    # simple scanlines + slight vignette / curvature
+    h, w = img.shape[:2]
+    vx2 = np.linspace(-1, 1, w, dtype=np.float32) ** 2
+    vy2 = np.linspace(-1, 1, h, dtype=np.float32) ** 2
+    out = np.empty_like(img)
+    run_strips(executor, 'crt', _crt_rows, h, img, out, scan_alpha, vx2, vy2)
+    return out
 
 
 def color_grade_upside_down(img):
@@ -0,0 +1,92 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+
+
+class StripExecutor:
+    # runs per-pixel kernels over horizontal strips on a persistent thread pool.
+    # a kernel is called as kernel(y0, y1, *args) and writes rows y0:y1 of a
+    # shared output buffer, so strips never overlap and need no locking.
+    def __init__(self, n_strips=None, max_workers=None, baseline_every=None, cv_threads=None):
+        cores = os.cpu_count() or 1
+        self.max_workers = max(1, int(max_workers or cores))
+        self.n_strips = max(1, int(n_strips or self.max_workers))
+        # opt-in calibration: every Nth call of a stage runs as a single strip to give
+        # a serial baseline. That frame is slower, so leave it off for live use
+        self.baseline_every = max(1, int(baseline_every)) if baseline_every else None
+        self.pool = None
+        if self.max_workers > 1:
+            self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='strip')
+            # OpenCV calls inside the kernels (remap) start their own thread pool;
+            # cv_threads=1 stops them competing with the strip workers. This is
+            # process-wide, so the untiled OpenCV stages lose their threads too
+            if cv_threads is not None:
+                cv2.setNumThreads(int(cv_threads))
+        # stage -> [parallel calls, parallel wall seconds, serial calls, serial wall seconds, calls seen]
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def strips(self, h):
+        n = max(1, min(self.n_strips, h))
+        step = -(-h // n)
+        return [(y0, min(h, y0 + step)) for y0 in range(0, h, step)]
+
+    def run(self, stage, kernel, h, *args):
+        with self._lock:
+            entry = self.stats.setdefault(stage, [0, 0.0, 0, 0.0, 0])
+            seen = entry[4]
+            entry[4] += 1
+        spans = self.strips(h)
+        serial = self.pool is None or len(spans) == 1
+        if self.baseline_every is not None and seen > 0 and seen % self.baseline_every == 0:
+            serial = True
+        t0 = time.perf_counter()
+        if serial:
+            kernel(0, h, *args)
+        else:
+            futures = [self.pool.submit(kernel, y0, y1, *args) for y0, y1 in spans]
+            for f in futures:
+                f.result()
+        wall = time.perf_counter() - t0
+        if seen == 0:
+            # first call pays cold caches and allocator warm-up, keep it out of the stats
+            return
+        with self._lock:
+            if serial:
+                entry[2] += 1
+                entry[3] += wall
+            else:
+                entry[0] += 1
+                entry[1] += wall
+
+    def report(self):
+        # speedup is mean serial wall time over mean strip-parallel wall time for the same stage
+        lines = ['stage        calls  serial ms  strips ms   speedup']
+        for stage, (calls, wall, s_calls, s_wall, _) in sorted(self.stats.items(), key=lambda kv: -(kv[1][1] + kv[1][3])):
+            serial_ms = 1000.0 * s_wall / s_calls if s_calls else float('nan')
+            par_ms = 1000.0 * wall / calls if calls else float('nan')
+            if calls and s_calls and wall > 0:
+                speedup = f'{serial_ms / par_ms:>8.2f}x'
+            else:
+                speedup = '       -'
+            lines.append(f'{stage:<12} {calls + s_calls:>5} {serial_ms:>10.2f} {par_ms:>10.2f} {speedup}')
+        return '\n'.join(lines)
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+
+def run_strips(executor, stage, kernel, h, *args):
+    # serial fallback keeps every shader usable without a pool
+    if executor is None:
+        kernel(0, h, *args)
+    else:
+        executor.run(stage, kernel, h, *args)
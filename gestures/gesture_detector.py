@@ -1,25 +1,44 @@
 import math
+import time
 import numpy as np
-from collections import deque
+from .landmark_buffer import LandmarkRing
+
+# wrist and palm base landmarks, averaged for palm motion
+PALM = [0, 1, 5, 9]
+# ring buffer hand ids by handedness label
+HAND_IDS = {'left': 0, 'right': 1}
 
 
 class GestureState:
     def __init__(self):
         self.pinch = [False, False]
         self.pinch_pos = [None, None]
-        self.pinch_history = [deque(maxlen=8), deque(maxlen=8)]
+        # handedness label ('left'/'right') of the hand in each slot, None when empty
+        self.hand = [None, None]
         self.two_hand_distance = 0.0
         self.two_hand_scale = 1.0
         self.rotation = 0.0
         self.pushing = False
         self.push_cooldown = 0
+        # windowed motion of the primary palm (normalized units per second)
+        self.velocity = (0.0, 0.0, 0.0)
+        self.acceleration = (0.0, 0.0, 0.0)
+        self.rotation_rate = 0.0
+        self.swipe = None  # 'left', 'right', 'up', 'down'
 
 
 class GestureDetector:
-    def __init__(self, pinch_thresh=0.06, push_thresh=0.06):
+    def __init__(self, pinch_thresh=0.06, push_thresh=0.06, swipe_speed=1.2, history=16):
         # thresholds in normalized coordinates
         self.pinch_thresh = pinch_thresh
         self.push_thresh = push_thresh
+        # palm speed in frame widths/heights per second
+        self.swipe_speed = swipe_speed
+        self.push_window = 4
+        self.swipe_window = 6
+        self.push_cooldown = 0.6
+        self.history = LandmarkRing(size=history)
+        self.last_push_time = None
         self.state = GestureState()
 
     @staticmethod
@@ -31,18 +50,22 @@ class GestureDetector:
     def _dist(a, b):
         return math.hypot(a[0] - b[0], a[1] - b[1])
 
-    def update(self, hands, frame_shape):
+    def update(self, hands, frame_shape, now=None):
         # hands is list of dicts with 'label' and 'landmarks' (x, y, z in px and z normalized)
         s = self.state
+        if now is None:
+            now = time.time()
         # reset
         s.two_hand_distance = 0.0
         s.rotation = 0.0
         s.pushing = False
+        s.velocity = (0.0, 0.0, 0.0)
+        s.acceleration = (0.0, 0.0, 0.0)
+        s.rotation_rate = 0.0
+        s.swipe = None
         # compute per-hand gestures
         for i in range(2):
             s.pinch[i] = False
-        if len(hands) == 0:
-            return s
         # map hands to left/right consistently
         hands_map = {}
         for h in hands:
@@ -53,6 +76,15 @@ class GestureDetector:
         else:
             # single hand: use index 0 as primary
             ordered = hands
+        # record every frame, including empty ones, so windows never span a gap
+        # slot 0 follows whichever hand is primary, so tag slots with handedness
+        # to keep windows from spanning a switch to the other hand
+        self.history.push(now, [h['landmarks'] for h in ordered[:2]],
+                          [HAND_IDS.get(h['label'].lower(), 2) for h in ordered[:2]])
+        for i in range(2):
+            s.hand[i] = ordered[i]['label'].lower() if i < len(ordered) else None
+        if len(hands) == 0:
+            return s
         # detect pinch for up to two hands
         for idx, hand in enumerate(ordered[:2]):
             lm = hand['landmarks']
@@ -67,7 +99,6 @@ class GestureDetector:
                 px = (lm[4][0] + lm[8][0]) / 2.0
                 py = (lm[4][1] + lm[8][1]) / 2.0
                 s.pinch_pos[idx] = (px, py)
-                s.pinch_history[idx].append((px, py))
             else:
                 s.pinch_pos[idx] = None
         # two-hand distance & scale
@@ -88,24 +119,34 @@ class GestureDetector:
         ang1 = math.atan2(v1[1], v1[0])
         ang2 = math.atan2(v2[1], v2[0])
         s.rotation = ang1 - ang2
-        # palm push detection: use z of wrist (landmark 0) or average of palm landmarks
-        # Mediapipe z is negative toward camera; detect sudden change forward (more negative)
-        if len(ordered) > 0:
-            zvals = [p['landmarks'][i][2] for i in [0, 1, 5, 9]]
-            zavg = sum(zvals) / len(zvals)
-            # store history in deque
-            if not hasattr(self, 'z_history'):
-                self.z_history = deque(maxlen=6)
-            self.z_history.append(zavg)
-            if len(self.z_history) >= 4:
-                # compute delta
-                dz = self.z_history[-2] - self.z_history[-1]
-                if dz > self.push_thresh and (not getattr(self, 'last_push_time', 0) or (millis() - getattr(self, 'last_push_time', 0) > 600)):
-                    s.pushing = True
-                    self.last_push_time = millis()
+        self._update_motion(s, frame_shape, now)
         return s
 
-
-def millis():
-    import time
-    return int(time.time() * 1000)
+    def _update_motion(self, s, frame_shape, now):
+        # windowed features for the primary hand, all computed over the landmark ring
+        h, w = frame_shape[:2]
+        scale = np.array((1.0 / w, 1.0 / h, 1.0))
+        t, vel = self.history.velocity(0, PALM, self.swipe_window)
+        if len(t) >= 2:
+            v = vel.mean(axis=0) * scale
+            s.velocity = tuple(float(c) for c in v)
+            _, acc = self.history.acceleration(0, PALM, self.swipe_window)
+            s.acceleration = tuple(float(c) for c in acc[-1] * scale)
+            _, rate = self.history.angle_rate(0, 0, 9, self.swipe_window)
+            s.rotation_rate = float(rate.mean())
+            # swipe: sustained, mostly one-axis palm motion across the window
+            vx, vy = v[0], v[1]
+            if abs(vx) > self.swipe_speed and abs(vx) > 2.0 * abs(vy):
+                s.swipe = 'right' if vx > 0 else 'left'
+            elif abs(vy) > self.swipe_speed and abs(vy) > 2.0 * abs(vx):
+                s.swipe = 'down' if vy > 0 else 'up'
+        # palm push detection: Mediapipe z is negative toward camera; detect a
+        # sudden forward step (more negative) that the window confirms as net forward motion
+        t, palm = self.history.track(0, PALM, self.push_window)
+        if len(t) >= self.push_window:
+            z = palm[:, 2]
+            dz = z[-2] - z[-1]
+            if dz > self.push_thresh and z[0] - z[-1] > self.push_thresh:
+                if self.last_push_time is None or now - self.last_push_time > self.push_cooldown:
+                    s.pushing = True
+                    self.last_push_time = now
@@ -0,0 +1,81 @@
+import numpy as np
+
+
+class LandmarkRing:
+    # fixed-size history of the last K frames of hand landmarks.
+    # data is a contiguous (K, hands, 21, 3) float32 array holding the raw
+    # tracker values (x, y in px, z normalized); valid marks which hand slots
+    # were present in each frame and ids which physical hand (e.g. handedness)
+    # filled the slot, so a window never spans a slot changing hands
+    def __init__(self, size=16, hands=2, points=21):
+        self.size = size
+        self.data = np.zeros((size, hands, points, 3), dtype=np.float32)
+        self.times = np.zeros(size, dtype=np.float64)
+        self.valid = np.zeros((size, hands), dtype=bool)
+        self.ids = np.full((size, hands), -1, dtype=np.int8)
+        self.head = 0
+        self.count = 0
+
+    def push(self, t, hands, ids=None):
+        # hands: list of per-hand landmark lists, in slot order; ids: matching hand ids
+        last = (self.head - 1) % self.size
+        if self.count and t <= self.times[last]:
+            # coarse clocks (time.time on Windows) can repeat a timestamp; the newer
+            # sample replaces the last one so rates never divide by a zero interval
+            self._fill(last, hands, ids)
+            return
+        i = self.head
+        self.times[i] = t
+        self._fill(i, hands, ids)
+        self.head = (i + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def _fill(self, i, hands, ids):
+        self.valid[i] = False
+        self.ids[i] = -1
+        for k, lm in enumerate(hands[:self.data.shape[1]]):
+            self.data[i, k] = lm
+            self.valid[i, k] = True
+            self.ids[i, k] = ids[k] if ids is not None else 0
+
+    def window(self, n=None):
+        # last n frames, oldest first
+        n = self.count if n is None else min(n, self.count)
+        idx = (self.head - n + np.arange(n)) % self.size
+        return self.times[idx], self.data[idx], self.valid[idx], self.ids[idx]
+
+    def run(self, hand, n=None):
+        # trailing stretch of the window where the same hand held this slot in every frame
+        t, data, valid, ids = self.window(n)
+        if len(t) == 0:
+            return t, data[:, hand]
+        same = valid[:, hand] & (ids[:, hand] == ids[-1, hand])
+        missing = np.flatnonzero(~same)
+        start = missing[-1] + 1 if missing.size else 0
+        return t[start:], data[start:, hand]
+
+    def track(self, hand, points, n=None):
+        # per-frame mean position of the given landmarks, shape (m, 3)
+        t, lm = self.run(hand, n)
+        return t, lm[:, points].mean(axis=1)
+
+    def velocity(self, hand, points, n=None):
+        t, pos = self.track(hand, points, n)
+        return t, _rate(t, pos)
+
+    def acceleration(self, hand, points, n=None):
+        t, vel = self.velocity(hand, points, n)
+        return t, _rate(t, vel)
+
+    def angle_rate(self, hand, a, b, n=None):
+        # angular velocity (rad/s) of the image-plane vector from landmark a to b
+        t, lm = self.run(hand, n)
+        v = lm[:, b, :2] - lm[:, a, :2]
+        ang = np.unwrap(np.arctan2(v[:, 1], v[:, 0]))
+        return t, _rate(t, ang)
+
+
+def _rate(t, values):
+    if len(t) < 2:
+        return values[:0]
+    return np.gradient(values, t, axis=0)
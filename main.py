@@ -9,51 +9,61 @@ import math
 import numpy as np
 from gestures.hand_tracking import HandTracker
 from gestures.gesture_detector import GestureDetector
-from effects.portal import Portal
+import sys
+from effects.scene import PortalScene
+from effects.tiles import StripExecutor
 from utils.helpers import map_range
+from utils.memprofile import MemoryProfiler
+from utils.hud import HudLayer, quantize
 
 
-def draw_status_overlay(img, gstate, portal, hands):
-    h, w = img.shape[:2]
+def make_hud(w):
+    hud = HudLayer()
     y = 40
     fh = 32
     # FPS and portal
-    cv2.putText(img, f'Portal: {portal.state} {portal.open_amount:.2f}', (20, y), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (230, 230, 230), 2)
-    y += fh
+    hud.field('portal', (20, y), 0.8)
+    hud.field('dist', (20, y + fh), 0.7)
+    hud.field('rotation', (20, y + 2 * fh), 0.7)
+    hud.field('push', (20, y + 3 * fh), 0.8)
+    for i in range(2):
+        hud.field(f'hand{i}', (int(20 + i * 220), y + 4 * fh), 0.7)
+    hud.field('mode', (w - 380, 40), 0.8)
+    hud.field('demo', (w - 380, 80), 0.7)
+    hud.field('fps', (20, 40), 1.0)
+    return hud
+
+
+def draw_status_overlay(hud, gstate, portal, hands):
+    hud.set('portal', f'Portal: {portal.state} {quantize(portal.open_amount, 0.05):.2f}', (230, 230, 230))
     # Two-hand distance
-    cv2.putText(img, f'TwoHandDist: {gstate.two_hand_distance:.2f}', (20, y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (220, 180, 200), 2)
-    y += fh
+    hud.set('dist', f'TwoHandDist: {quantize(gstate.two_hand_distance, 0.02):.2f}', (220, 180, 200))
     # Rotation
-    rot_deg = math.degrees(gstate.rotation)
-    cv2.putText(img, f'Rotation: {rot_deg:.1f} deg', (20, y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 220, 200), 2)
-    y += fh
+    rot_deg = quantize(math.degrees(gstate.rotation), 1.0)
+    hud.set('rotation', f'Rotation: {rot_deg:.1f} deg', (200, 220, 200))
     # Push
     push_txt = 'PUSH DETECTED' if gstate.pushing else 'push: -'
-    cv2.putText(img, push_txt, (20, y), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (20, 230, 250) if gstate.pushing else (180, 180, 180), 2)
-    y += fh
+    hud.set('push', push_txt, (20, 230, 250) if gstate.pushing else (180, 180, 180))
     # Pinch info
     for i in range(2):
         status = 'Pinch' if gstate.pinch[i] else 'NoPinch'
-        xpos = int(20 + i * 220)
-        cv2.putText(img, f'Hand{i+1}: {status}', (xpos, y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (230, 120, 140) if gstate.pinch[i] else (150, 150, 150), 2)
+        hud.set(f'hand{i}', f'Hand{i+1}: {status}', (230, 120, 140) if gstate.pinch[i] else (150, 150, 150))
     # draw pinch positions
     for i in range(2):
         if gstate.pinch_pos[i] is not None:
-            px, py = int(gstate.pinch_pos[i][0]), int(gstate.pinch_pos[i][1])
-            cv2.circle(img, (px, py), 12, (0, 255, 255), 2, lineType=cv2.LINE_AA)
+            hud.mark(gstate.pinch_pos[i], 12, (0, 255, 255))
     # draw portal center
-    cv2.circle(img, (int(portal.center[0]), int(portal.center[1])), max(6, int(8 + portal.open_amount * 10)), (180, 40, 220), 2, lineType=cv2.LINE_AA)
+    hud.mark(portal.center, max(6, int(8 + portal.open_amount * 10)), (180, 40, 220))
 
 
-def draw_mode_hint(img, upside_down_mode, demo_mode):
-    h, w = img.shape[:2]
+def draw_mode_hint(hud, upside_down_mode, demo_mode):
     txt = 'Mode: UpsideDown' if upside_down_mode else 'Mode: Normal'
     demo = 'Demo: ON' if demo_mode else 'Demo: OFF'
-    cv2.putText(img, txt, (w - 380, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (220, 200, 220), 2)
-    cv2.putText(img, demo, (w - 380, 80), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2)
+    hud.set('mode', txt, (220, 200, 220))
+    hud.set('demo', demo, (200, 200, 200))
 
 
-def main():
+def main(per_hand=False):
     cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
     # use lower resolution for better real-time performance
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 960)
@@ -65,10 +75,27 @@ def main():
         print('Cannot open camera')
         return
     h, w = frame.shape[:2]
-    portal = Portal(size=(w, h))
+    # split the full-frame shader passes into strips across all cores
+    executor = StripExecutor()
+    # simulation steps at a fixed 30 Hz regardless of camera/render rate
+    scene = PortalScene(size=(w, h), executor=executor, sim_hz=30.0)
+    if per_hand:
+        # one portal per hand, each dragged by its own pinch
+        scene.add((w // 3, h // 2))
+        scene.add((2 * w // 3, h // 2))
+    else:
+        scene.add()
+    portals = scene.portals
+    portal = portals[0]
+    hud = make_hud(w)
+    fps = None
     last_time = time.time()
-    dragging = False
-    drag_offset = (0, 0)
+    dragging = [False] * len(portals)
+    drag_offset = [(0, 0)] * len(portals)
+    # tracker slots follow whichever hands are visible, so per-hand portals are
+    # bound by handedness; None means the primary hand in slot 0
+    portal_hands = ['left', 'right'] if per_hand else [None]
+    drag_hand = [None] * len(portals)
 
     upside_down_mode = True
     demo_mode = False
@@ -85,7 +112,7 @@ def main():
             dt = now - last_time
             last_time = now
             hands = tracker.process(frame, draw=False)
-            gstate = detector.update(hands, frame.shape)
+            gstate = detector.update(hands, frame.shape, now)
             # update last seen hands time
             if len(hands) > 0:
                 last_hand_seen = now
@@ -97,38 +124,62 @@ def main():
                 if (now - last_hand_seen) > hand_absence_timeout:
                     if upside_down_mode:
                         upside_down_mode = False
-                        portal.close()
+                        for p in portals:
+                            p.close()
             # gesture actions
             # Two-hand stretch -> open portal when distance exceeds threshold
-            if gstate.two_hand_distance > 0.25 and portal.state in ['closed', 'closing']:
-                portal.open()
-            # pinch + drag (primary hand)
+            for p in portals:
+                if gstate.two_hand_distance > 0.25 and p.state in ['closed', 'closing']:
+                    p.open()
+            # pinch + drag (left hand drags portal 0 and right hand portal 1; the primary hand only, with a single portal)
             if len(hands) > 0:
-                if gstate.pinch[0] and gstate.pinch_pos[0] is not None:
-                    px, py = gstate.pinch_pos[0]
-                    if not dragging:
-                        dragging = True
-                        drag_offset = (portal.center[0] - px, portal.center[1] - py)
-                    portal.set_pos((px + drag_offset[0], py + drag_offset[1]))
-                else:
-                    dragging = False
-            # rotate hand -> twist
+                for i, p in enumerate(portals):
+                    want = portal_hands[i]
+                    if want is None:
+                        slot = 0
+                    else:
+                        slot = gstate.hand.index(want) if want in gstate.hand else None
+                    # another hand took over, so don't carry the old drag offset
+                    hand = gstate.hand[slot] if slot is not None else None
+                    if hand != drag_hand[i]:
+                        dragging[i] = False
+                        drag_hand[i] = hand
+                    if slot is not None and gstate.pinch[slot] and gstate.pinch_pos[slot] is not None:
+                        px, py = gstate.pinch_pos[slot]
+                        if not dragging[i]:
+                            dragging[i] = True
+                            drag_offset[i] = (p.center[0] - px, p.center[1] - py)
+                        p.set_pos((px + drag_offset[i][0], py + drag_offset[i][1]))
+                    else:
+                        dragging[i] = False
+            # rotate hand -> twist; the gain is tuned per 1/30 s, so scale by the
+            # frame time to keep the twist rate independent of the render rate
             if abs(gstate.rotation) > 0.05:
-                portal.apply_twist(gstate.rotation * 0.8)
+                for p in portals:
+                    p.apply_twist(gstate.rotation * 0.8 * min(dt, 0.1) * 30.0)
             # palm push -> close
             if gstate.pushing:
-                portal.close()
-            # update portal
-            portal.update(dt)
+                for p in portals:
+                    p.close()
+            # update portals and the shared particle pools
+            scene.update(dt)
             # render scene (portal render still respects portal state)
             # pass upside_down_mode to portal if later we want different params (currently portal global visual toggles are via main)
-            out = portal.render(frame, upside_down=upside_down_mode)
-            # overlay HUD
-            draw_status_overlay(out, gstate, portal, hands)
-            draw_mode_hint(out, upside_down_mode, demo_mode)
-            # fps
-            fps = int(1.0 / max(1e-6, dt))
-            cv2.putText(out, f'FPS: {fps}', (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (200, 200, 200), 2)
+            out = scene.render(frame, upside_down=upside_down_mode)
+            if scene.profiler is not None:
+                scene.profiler.end_frame()
+                if scene.profiler.done:
+                    print(f'Memory profile written to {scene.profiler.path}')
+                    scene.profiler = None
+            # overlay HUD, only changed fields are re-rasterized
+            if hud.enabled:
+                draw_status_overlay(hud, gstate, portal, hands)
+                draw_mode_hint(hud, upside_down_mode, demo_mode)
+                # fps, smoothed so the readout does not churn every frame
+                inst = 1.0 / max(1e-6, dt)
+                fps = inst if fps is None else 0.9 * fps + 0.1 * inst
+                hud.set('fps', f'FPS: {int(quantize(fps, 1.0))}', (200, 200, 200))
+                hud.draw(out)
             cv2.imshow('Open the Gate to the Upside Down', out)
             key = cv2.waitKey(1) & 0xFF
             if key == 27:
@@ -136,29 +187,39 @@ def main():
             elif key == ord('u'):
                 upside_down_mode = not upside_down_mode
                 # toggle stronger effects by flipping portal params
-                if upside_down_mode:
-                    portal.radius = int(min(w, h) // 5)
-                else:
-                    portal.radius = int(min(w, h) // 6)
+                for p in portals:
+                    if upside_down_mode:
+                        p.radius = int(min(w, h) // 5)
+                    else:
+                        p.radius = int(min(w, h) // 6)
             elif key == ord('d'):
                 demo_mode = not demo_mode
+            elif key == ord('h'):
+                hud.enabled = not hud.enabled
+            elif key == ord('m') and scene.profiler is None:
+                # profile allocations of the next 120 rendered frames
+                scene.profiler = MemoryProfiler(frames=120)
             # demo automation: open/close every few seconds
             if demo_mode:
                 demo_timer += dt
                 if demo_timer > 3.0:
                     demo_timer = 0.0
-                    if portal.state in ['closed', 'closing']:
-                        portal.open()
-                    else:
-                        portal.close()
+                    for p in portals:
+                        if p.state in ['closed', 'closing']:
+                            p.open()
+                        else:
+                            p.close()
     finally:
         tracker.close()
         cap.release()
+        print(executor.report())
+        print(hud.report())
+        executor.close()
         cv2.destroyAllWindows()
 
 
 if __name__ == '__main__':
-    main()
+    main(per_hand='--per-hand' in sys.argv)
 
 if __name__ == '__main__':
-    main()
+    main(per_hand='--per-hand' in sys.argv)
@@ -0,0 +1,20 @@
+class SimClock:
+    # fixed-timestep accumulator: the simulation advances in whole steps of
+    # 1/hz no matter how often we render, and alpha tells the renderer how far
+    # the current frame sits between the last two simulated states
+    def __init__(self, hz=30.0, max_steps=4):
+        self.step = 1.0 / hz
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.alpha = 0.0
+
+    def advance(self, dt):
+        self.accumulator += max(0.0, dt)
+        steps = int(self.accumulator / self.step)
+        if steps > self.max_steps:
+            # after a stall drop the backlog instead of spiralling into catch-up work
+            steps = self.max_steps
+            self.accumulator = self.accumulator % self.step + steps * self.step
+        self.accumulator -= steps * self.step
+        self.alpha = min(1.0, self.accumulator / self.step)
+        return steps
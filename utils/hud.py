@@ -0,0 +1,104 @@
+import time
+import cv2
+import numpy as np
+
+
+def quantize(v, step):
+    # snap noisy readouts so the text only changes when the value really moves
+    return round(v / step) * step
+
+
+class HudField:
+    def __init__(self, org, scale, thickness=2, font=cv2.FONT_HERSHEY_SIMPLEX):
+        self.org = org
+        self.scale = scale
+        self.thickness = thickness
+        self.font = font
+        self.key = None
+        self.pos = None
+        self.bgr = None
+        self.alpha = None
+
+
+class HudLayer:
+    # text panels rasterized once into cached premultiplied BGR + alpha patches;
+    # a field is re-rasterized only when its text or color changes, and each
+    # frame only the patch rectangles are blended onto the output
+    def __init__(self):
+        self.enabled = True
+        self.fields = {}
+        self.sprites = {}
+        self.marks = []
+        self.frames = 0
+        self.rasterized = 0
+        self.cost = 0.0
+
+    def field(self, name, org, scale, thickness=2):
+        self.fields[name] = HudField(org, scale, thickness)
+
+    def set(self, name, text, color):
+        f = self.fields[name]
+        key = (text, color)
+        if f.key == key:
+            return
+        t0 = time.perf_counter()
+        (tw, th), base = cv2.getTextSize(text, f.font, f.scale, f.thickness)
+        pad = f.thickness
+        size = (th + base + 2 * pad, tw + 2 * pad)
+        f.bgr = np.zeros(size + (3,), dtype=np.uint8)
+        f.alpha = np.zeros(size, dtype=np.uint8)
+        o = (pad, pad + th)
+        cv2.putText(f.bgr, text, o, f.font, f.scale, color, f.thickness)
+        cv2.putText(f.alpha, text, o, f.font, f.scale, 255, f.thickness)
+        f.pos = (f.org[0] - pad, f.org[1] - th - pad)
+        f.key = key
+        self.rasterized += 1
+        self.cost += time.perf_counter() - t0
+
+    def mark(self, center, radius, color, thickness=2):
+        # anti-aliased ring, drawn from a cached sprite for this frame only
+        key = (radius, color, thickness)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            r = radius + thickness + 1
+            bgr = np.zeros((2 * r + 1, 2 * r + 1, 3), dtype=np.uint8)
+            alpha = np.zeros((2 * r + 1, 2 * r + 1), dtype=np.uint8)
+            cv2.circle(bgr, (r, r), radius, color, thickness, lineType=cv2.LINE_AA)
+            cv2.circle(alpha, (r, r), radius, 255, thickness, lineType=cv2.LINE_AA)
+            sprite = (r, bgr, alpha)
+            self.sprites[key] = sprite
+            self.rasterized += 1
+        r, bgr, alpha = sprite
+        self.marks.append(((int(center[0]) - r, int(center[1]) - r), bgr, alpha))
+
+    def draw(self, img):
+        marks, self.marks = self.marks, []
+        if not self.enabled:
+            return img
+        t0 = time.perf_counter()
+        for f in self.fields.values():
+            if f.pos is not None:
+                _blend(img, f.pos, f.bgr, f.alpha)
+        for pos, bgr, alpha in marks:
+            _blend(img, pos, bgr, alpha)
+        self.frames += 1
+        self.cost += time.perf_counter() - t0
+        return img
+
+    def report(self):
+        n = max(1, self.frames)
+        return f'HUD: {1000.0 * self.cost / n:.3f} ms/frame, {self.rasterized / n:.2f} re-rasterized/frame over {self.frames} frames'
+
+
+def _blend(img, pos, bgr, alpha):
+    # premultiplied over, clipped to the frame
+    h, w = img.shape[:2]
+    x, y = pos
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(w, x + bgr.shape[1]), min(h, y + bgr.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return
+    src = bgr[y0 - y:y1 - y, x0 - x:x1 - x].astype(np.uint16)
+    a = alpha[y0 - y:y1 - y, x0 - x:x1 - x, None].astype(np.uint16)
+    roi = img[y0:y1, x0:x1]
+    roi[:] = np.minimum(src + (roi * (255 - a) + 127) // 255, 255)
@@ -0,0 +1,135 @@
+import os
+import sys
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# numpy (and OpenCV outputs, which are numpy arrays) report data buffers to tracemalloc under this domain
+NUMPY_DOMAIN = getattr(np.lib, 'tracemalloc_domain', 389047)
+# allocations are reported at the first frame inside this tree, not inside numpy/cv2
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+# enough stack to climb out of numpy internals back into the repo
+TRACE_DEPTH = 16
+
+
+def _rss_kb():
+    # high-water RSS; ru_maxrss is in KB on Linux but bytes on macOS
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+class MemoryProfiler:
+    # opt-in per-stage memory profiler for the render loop, built on tracemalloc.
+    # tracemalloc has no per-allocation hook here, so a stage reports its peak
+    # working set (peak traced memory above entry, temporaries included), net
+    # growth and the numpy buffers still alive when it ends; it cannot count
+    # every temporary allocated and freed inside a stage.
+    # stages must not nest: each one resets the traced-memory peak
+    def __init__(self, frames=120, path='memprofile.txt', large=1 << 20):
+        self.frames = frames
+        self.path = path
+        self.large = large
+        self.frame = 0
+        self.done = False
+        # stage -> [calls, peak bytes, net bytes, surviving arrays, rss kb, calls with a large temp, max temp bytes]
+        self.stats = {}
+        # (stage, file:line) -> bytes of large buffers still alive after the stage
+        self.sites = {}
+        tracemalloc.start(TRACE_DEPTH)
+
+    def _numpy_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.DomainFilter(True, NUMPY_DOMAIN)])
+
+    @contextmanager
+    def stage(self, name):
+        before = self._numpy_snapshot()
+        rss0 = _rss_kb()
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        try:
+            yield
+        finally:
+            end, peak = tracemalloc.get_traced_memory()
+            rss1 = _rss_kb()
+            diff = self._numpy_snapshot().compare_to(before, 'traceback')
+            self._record(name, start, end, peak, rss0, rss1, diff)
+
+    def _record(self, name, start, end, peak, rss0, rss1, diff):
+        entry = self.stats.setdefault(name, [0, 0, 0, 0, 0, 0, 0])
+        entry[0] += 1
+        # peak working set above the entry level, outputs and temporaries included
+        entry[1] += max(0, peak - start)
+        entry[2] += end - start
+        entry[3] += sum(d.count_diff for d in diff if d.count_diff > 0)
+        if rss0 is not None:
+            entry[4] += rss1 - rss0
+        # memory that came and went inside the stage
+        temp = peak - end
+        if temp >= self.large:
+            entry[5] += 1
+        entry[6] = max(entry[6], temp)
+        sizes = {}
+        for d in diff:
+            if d.size_diff > 0:
+                site = _repo_site(d.traceback)
+                sizes[site] = sizes.get(site, 0) + d.size_diff
+        for site, size in sizes.items():
+            if size >= self.large:
+                key = (name, site)
+                self.sites[key] = self.sites.get(key, 0) + size
+
+    def end_frame(self):
+        if self.done:
+            return
+        self.frame += 1
+        if self.frame >= self.frames:
+            self.write()
+            tracemalloc.stop()
+            self.done = True
+
+    def report(self):
+        n = max(1, self.frame)
+        mb = 1.0 / (1 << 20)
+        lines = [f'render memory over {n} frames, ranked by peak working set per frame',
+                 'peak = traced memory high-water above stage entry (a lower bound on bytes allocated);',
+                 'surviving arrays = numpy buffers created in the stage and still alive after it;',
+                 'RSS growth = growth of the process RSS high-water mark;',
+                 f'large temp calls = calls whose freed temporaries reached {self.large * mb:.1f} MB; all but max temp are per frame',
+                 'stage        calls/f   peak MB/f  net MB/f  surviving arrays/f  RSS growth KB/f  large temp calls/f  max temp MB']
+        for name, e in sorted(self.stats.items(), key=lambda kv: -kv[1][1]):
+            calls, alloc, net, arrays, rss, temps, max_temp = e
+            lines.append(f'{name:<12} {calls / n:>7.1f} {alloc * mb / n:>11.2f} {net * mb / n:>9.2f} '
+                         f'{arrays / n:>19.1f} {rss / n:>16.1f} {temps / n:>19.2f} {max_temp * mb:>12.2f}')
+        if self.sites:
+            lines.append('')
+            lines.append(f'large surviving allocations (>= {self.large * mb:.1f} MB), MB per frame')
+            for (name, site), size in sorted(self.sites.items(), key=lambda kv: -kv[1])[:15]:
+                lines.append(f'{size * mb / n:>8.2f}  {name:<12} {site}')
+        return '\n'.join(lines)
+
+    def write(self):
+        with open(self.path, 'w') as f:
+            f.write(self.report() + '\n')
+
+
+def _repo_site(traceback):
+    # most recent first; the first frame in the repo is the line that asked for the buffer
+    for frame in traceback:
+        path = os.path.abspath(frame.filename)
+        if path.startswith(REPO_ROOT) and 'site-packages' not in path:
+            return f'{os.path.relpath(path, REPO_ROOT)}:{frame.lineno}'
+    frame = traceback[0]
+    return f'{frame.filename}:{frame.lineno}'
+
+
+def stage(profiler, name):
+    # no-op context when profiling is off
+    return profiler.stage(name) if profiler is not None else nullcontext()